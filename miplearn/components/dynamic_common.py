@@ -47,19 +47,30 @@ class DynamicConstraintsComponent(Component):
         Dict[ConstraintCategory, List[List[float]]],
         Dict[ConstraintCategory, List[List[bool]]],
         Dict[ConstraintCategory, List[ConstraintName]],
+    ]:
+        x_np, y_np, cids_np = self._sample_xy_with_cids_np(instance, sample)
+        x = {c: v.tolist() for (c, v) in x_np.items()}
+        y = {c: v.tolist() for (c, v) in y_np.items()}
+        cids = {c: v.tolist() for (c, v) in cids_np.items()}
+        return x, y, cids
+
+    def _sample_xy_with_cids_np(
+        self,
+        instance: Optional[Instance],
+        sample: Sample,
+    ) -> Tuple[
+        Dict[ConstraintCategory, np.ndarray],
+        Dict[ConstraintCategory, np.ndarray],
+        Dict[ConstraintCategory, np.ndarray],
     ]:
         if len(self.known_cids) == 0:
             return {}, {}, {}
         assert instance is not None
-        x: Dict[ConstraintCategory, List[List[float]]] = {}
-        y: Dict[ConstraintCategory, List[List[bool]]] = {}
-        cids: Dict[ConstraintCategory, List[ConstraintName]] = {}
+        x: Dict[ConstraintCategory, np.ndarray] = {}
+        y: Dict[ConstraintCategory, np.ndarray] = {}
+        cids: Dict[ConstraintCategory, np.ndarray] = {}
         known_cids = np.array(self.known_cids, dtype="S")
-
-        enforced_cids = None
-        enforced_cids_np = sample.get_array(self.attr)
-        if enforced_cids_np is not None:
-            enforced_cids = list(enforced_cids_np)
+        enforced_cids = sample.get_array(self.attr)
 
         # Get user-provided constraint features
         (
@@ -80,11 +91,12 @@ class DynamicConstraintsComponent(Component):
 
         categories = np.unique(constr_categories)
         for c in categories:
-            x[c] = constr_features[constr_categories == c].tolist()
-            cids[c] = known_cids[constr_categories == c].tolist()
+            selected = constr_categories == c
+            x[c] = constr_features[selected]
+            cids[c] = known_cids[selected]
             if enforced_cids is not None:
                 tmp = np.isin(cids[c], enforced_cids).reshape(-1, 1)
-                y[c] = np.hstack([~tmp, tmp]).tolist()  # type: ignore
+                y[c] = np.hstack([~tmp, tmp])
 
         return x, y, cids
 
@@ -115,18 +127,15 @@ class DynamicConstraintsComponent(Component):
         if len(self.known_cids) == 0:
             logger.info("Classifiers not fitted. Skipping.")
             return pred
-        x, _, cids = self.sample_xy_with_cids(instance, sample)
+        x, _, cids = self._sample_xy_with_cids_np(instance, sample)
         for category in x.keys():
             assert category in self.classifiers
             assert category in self.thresholds
             clf = self.classifiers[category]
             thr = self.thresholds[category]
-            nx = np.array(x[category])
-            proba = clf.predict_proba(nx)
-            t = thr.predict(nx)
-            for i in range(proba.shape[0]):
-                if proba[i][1] > t[1]:
-                    pred += [cids[category][i]]
+            proba = clf.predict_proba(x[category])
+            t = thr.predict(x[category])
+            pred.extend(cids[category][proba[:, 1] > t[1]].tolist())
         return pred
 
     @overrides
@@ -153,8 +162,9 @@ class DynamicConstraintsComponent(Component):
         instance: Instance,
         sample: Sample,
     ) -> Dict[str, float]:
-        actual = sample.get_array(self.attr)
-        assert actual is not None
+        actual_np = sample.get_array(self.attr)
+        assert actual_np is not None
+        actual = set(actual_np)
         pred = set(self.sample_predict(instance, sample))
         tp, tn, fp, fn = 0, 0, 0, 0
         for cid in self.known_cids:
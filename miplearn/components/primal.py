@@ -154,31 +154,34 @@ class PrimalSolutionComponent(Component):
         assert var_names is not None
         assert var_categories is not None
 
-        for (i, var_name) in enumerate(var_names):
-            # Initialize categories
-            category = var_categories[i]
+        features = np.hstack(
+            [
+                instance_features.reshape(1, -1).repeat(len(var_names), axis=0),
+                var_features,
+            ]
+        )
+        for category in np.unique(var_categories):
             if len(category) == 0:
                 continue
-            if category not in x.keys():
-                x[category] = []
-                y[category] = []
+            selected = var_categories == category
 
             # Features
-            features = list(instance_features)
-            features.extend(var_features[i])
-            x[category].append(features)
+            x[category] = features[selected].tolist()
+            y[category] = []
 
             # Labels
             if mip_var_values is not None:
-                opt_value = mip_var_values[i]
-                assert opt_value is not None
-                assert 0.0 - 1e-5 <= opt_value <= 1.0 + 1e-5, (
-                    f"Variable {var_name} has non-binary value {opt_value} in the "
-                    "optimal solution. Predicting values of non-binary "
-                    "variables is not currently supported. Please set its "
-                    "category to ''."
+                opt_values = mip_var_values[selected]
+                is_binary = (opt_values >= 0.0 - 1e-5) & (opt_values <= 1.0 + 1e-5)
+                assert is_binary.all(), (
+                    f"Variable {var_names[selected][~is_binary][0]} has non-binary "
+                    f"value {opt_values[~is_binary][0]} in the optimal solution. "
+                    "Predicting values of non-binary variables is not currently "
+                    "supported. Please set its category to ''."
                 )
-                y[category].append([opt_value < 0.5, opt_value >= 0.5])
+                y[category] = np.vstack(
+                    [opt_values < 0.5, opt_values >= 0.5]
+                ).T.tolist()
         return x, y
 
     @overrides
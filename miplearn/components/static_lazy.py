@@ -225,28 +225,26 @@ class StaticLazyConstraintsComponent(Component):
         assert constr_categories is not None
         assert constr_lazy is not None
 
-        for (cidx, cname) in enumerate(constr_names):
-            # Initialize categories
-            if not constr_lazy[cidx]:
-                continue
-            category = constr_categories[cidx]
+        features = np.hstack(
+            [
+                instance_features.reshape(1, -1).repeat(len(constr_names), axis=0),
+                constr_features,
+            ]
+        )
+        for category in np.unique(constr_categories):
             if len(category) == 0:
                 continue
-            if category not in x:
-                x[category] = []
-                y[category] = []
-                cids[category] = []
+            selected = (constr_categories == category) & constr_lazy
+            if not selected.any():
+                continue
 
             # Features
-            features = list(instance_features)
-            features.extend(constr_features[cidx])
-            x[category].append(features)
-            cids[category].append(cname)
+            x[category] = features[selected].tolist()
+            cids[category] = constr_names[selected].tolist()
 
             # Labels
+            y[category] = []
             if lazy_enforced is not None:
-                if cname in lazy_enforced:
-                    y[category] += [[False, True]]
-                else:
-                    y[category] += [[True, False]]
+                enforced = np.isin(constr_names[selected], lazy_enforced)
+                y[category] = np.vstack([~enforced, enforced]).T.tolist()
         return x, y, cids
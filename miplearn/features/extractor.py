@@ -2,8 +2,7 @@
 #  Copyright (C) 2020-2021, UChicago Argonne, LLC. All rights reserved.
 #  Released under the modified BSD license. See COPYING.md for more details.
 
-from math import log, isfinite
-from typing import TYPE_CHECKING, List, Tuple, Optional
+from typing import TYPE_CHECKING, Any, List, Tuple, Optional
 
 import numpy as np
 from scipy.sparse import coo_matrix
@@ -26,6 +25,7 @@ class FeaturesExtractor:
         self.with_sa = with_sa
         self.with_lhs = with_lhs
         self.var_features_user: Optional[np.ndarray] = None
+        self.var_features_AlvLouWeh2017: Optional[np.ndarray] = None
 
     def extract_after_load_features(
         self,
@@ -70,19 +70,18 @@ class FeaturesExtractor:
         ) = self._extract_user_features_vars(instance, sample)
         self.var_features_user = vars_features_user
         sample.put_array("static_var_categories", var_categories)
-        assert variables.lower_bounds is not None
         assert variables.obj_coeffs is not None
-        assert variables.upper_bounds is not None
+        self.var_features_AlvLouWeh2017 = self._compute_AlvLouWeh2017(
+            A=constraints.lhs,
+            b=constraints.rhs,
+            c=variables.obj_coeffs,
+        )
         sample.put_array(
             "static_var_features",
             np.hstack(
                 [
                     vars_features_user,
-                    self._compute_AlvLouWeh2017(
-                        A=constraints.lhs,
-                        b=constraints.rhs,
-                        c=variables.obj_coeffs,
-                    ),
+                    self.var_features_AlvLouWeh2017,
                 ]
             ),
         )
@@ -113,16 +112,24 @@ class FeaturesExtractor:
         sample.put_array("lp_constr_slacks", constraints.slacks)
 
         # Variable features
+        c = sample.get_array("static_var_obj_coeffs")
+        var_features_AlvLouWeh2017 = self.var_features_AlvLouWeh2017
+        if var_features_AlvLouWeh2017 is None:
+            var_features_AlvLouWeh2017 = self._compute_AlvLouWeh2017(
+                A=sample.get_sparse("static_constr_lhs"),
+                b=sample.get_array("static_constr_rhs"),
+                c=c,
+            )
         lp_var_features_list = []
         for f in [
             self.var_features_user,
+            var_features_AlvLouWeh2017,
             self._compute_AlvLouWeh2017(
-                A=sample.get_sparse("static_constr_lhs"),
-                b=sample.get_array("static_constr_rhs"),
-                c=sample.get_array("static_var_obj_coeffs"),
+                c=c,
                 c_sa_up=variables.sa_obj_up,
                 c_sa_down=variables.sa_obj_down,
                 values=variables.values,
+                with_static=False,
             ),
         ]:
             if f is not None:
@@ -149,10 +156,10 @@ class FeaturesExtractor:
             if f is not None:
                 lp_constr_features_list.append(f)
         for f in [
-            sample.get_array("lp_constr_dual_values"),
-            sample.get_array("lp_constr_sa_rhs_down"),
-            sample.get_array("lp_constr_sa_rhs_up"),
-            sample.get_array("lp_constr_slacks"),
+            constraints.dual_values,
+            constraints.sa_rhs_down,
+            constraints.sa_rhs_up,
+            constraints.slacks,
         ]:
             if f is not None:
                 lp_constr_features_list.append(f.reshape(-1, 1))
@@ -186,7 +193,6 @@ class FeaturesExtractor:
         sample.put_array("mip_var_values", variables.values)
         sample.put_array("mip_constr_slacks", constraints.slacks)
 
-    # noinspection DuplicatedCode
     def _extract_user_features_vars(
         self,
         instance: "Instance",
@@ -196,107 +202,45 @@ class FeaturesExtractor:
         var_names = sample.get_array("static_var_names")
         assert var_names is not None
 
-        # Query variable features
+        # Query variable features and categories
         var_features = instance.get_variable_features(var_names)
-        assert isinstance(var_features, np.ndarray), (
-            f"Variable features must be a numpy array. "
-            f"Found {var_features.__class__} instead."
-        )
-        assert len(var_features.shape) == 2, (
-            f"Variable features must be 2-dimensional array. "
-            f"Found array with shape {var_features.shape} instead."
-        )
-        assert var_features.shape[0] == len(var_names), (
-            f"Variable features must have exactly {len(var_names)} rows. "
-            f"Found {var_features.shape[0]} rows instead."
-        )
-        assert var_features.dtype.kind in ["f"], (
-            f"Variable features must be floating point numbers. "
-            f"Found {var_features.dtype} instead."
-        )
-
-        # Query variable categories
+        _assert_is_matrix(var_features, len(var_names), "get_variable_features")
         var_categories = instance.get_variable_categories(var_names)
-        assert isinstance(var_categories, np.ndarray), (
-            f"Variable categories must be a numpy array. "
-            f"Found {var_categories.__class__} instead."
-        )
-        assert len(var_categories.shape) == 1, (
-            f"Variable categories must be a vector. "
-            f"Found array with shape {var_categories.shape} instead."
-        )
-        assert len(var_categories) == len(var_names), (
-            f"Variable categories must have exactly {len(var_names)} elements. "
-            f"Found {var_categories.shape[0]} elements instead."
-        )
-        assert var_categories.dtype.kind == "S", (
-            f"Variable categories must be a numpy array with dtype='S'. "
-            f"Found {var_categories.dtype} instead."
+        _assert_is_vector(
+            var_categories,
+            len(var_names),
+            "get_variable_categories",
+            "S",
+            "a numpy array with dtype='S'",
         )
         return var_features, var_categories
 
-    # noinspection DuplicatedCode
     @classmethod
     def _extract_user_features_constrs(
         cls,
         instance: "Instance",
         constr_names: np.ndarray,
     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
-        # Query constraint features
+        # Query constraint features and categories
         constr_features = instance.get_constraint_features(constr_names)
-        assert isinstance(constr_features, np.ndarray), (
-            f"get_constraint_features must return a numpy array. "
-            f"Found {constr_features.__class__} instead."
-        )
-        assert len(constr_features.shape) == 2, (
-            f"get_constraint_features must return a 2-dimensional array. "
-            f"Found array with shape {constr_features.shape} instead."
-        )
-        assert constr_features.shape[0] == len(constr_names), (
-            f"get_constraint_features must return an array with {len(constr_names)} "
-            f"rows. Found {constr_features.shape[0]} rows instead."
-        )
-        assert constr_features.dtype.kind in ["f"], (
-            f"get_constraint_features must return floating point numbers. "
-            f"Found {constr_features.dtype} instead."
-        )
-
-        # Query constraint categories
+        _assert_is_matrix(constr_features, len(constr_names), "get_constraint_features")
         constr_categories = instance.get_constraint_categories(constr_names)
-        assert isinstance(constr_categories, np.ndarray), (
-            f"get_constraint_categories must return a numpy array. "
-            f"Found {constr_categories.__class__} instead."
-        )
-        assert len(constr_categories.shape) == 1, (
-            f"get_constraint_categories must return a vector. "
-            f"Found array with shape {constr_categories.shape} instead."
-        )
-        assert len(constr_categories) == len(constr_names), (
-            f"get_constraint_categories must return a vector with {len(constr_names)} "
-            f"elements. Found {constr_categories.shape[0]} elements instead."
-        )
-        assert constr_categories.dtype.kind == "S", (
-            f"get_constraint_categories must return a numpy array with dtype='S'. "
-            f"Found {constr_categories.dtype} instead."
+        _assert_is_vector(
+            constr_categories,
+            len(constr_names),
+            "get_constraint_categories",
+            "S",
+            "a numpy array with dtype='S'",
         )
 
         # Query constraint lazy attribute
         constr_lazy = instance.are_constraints_lazy(constr_names)
-        assert isinstance(constr_lazy, np.ndarray), (
-            f"are_constraints_lazy must return a numpy array. "
-            f"Found {constr_lazy.__class__} instead."
-        )
-        assert len(constr_lazy.shape) == 1, (
-            f"are_constraints_lazy must return a vector. "
-            f"Found array with shape {constr_lazy.shape} instead."
-        )
-        assert constr_lazy.shape[0] == len(constr_names), (
-            f"are_constraints_lazy must return a vector with {len(constr_names)} "
-            f"elements. Found {constr_lazy.shape[0]} elements instead."
-        )
-        assert constr_lazy.dtype.kind == "b", (
-            f"are_constraints_lazy must return a boolean array. "
-            f"Found {constr_lazy.dtype} instead."
+        _assert_is_vector(
+            constr_lazy,
+            len(constr_names),
+            "are_constraints_lazy",
+            "b",
+            "a boolean array",
         )
 
         return constr_features, constr_categories, constr_lazy
@@ -307,17 +251,13 @@ class FeaturesExtractor:
         sample: Sample,
     ) -> None:
         features = instance.get_instance_features()
-        assert isinstance(features, np.ndarray), (
-            f"Instance features must be a numpy array. "
-            f"Found {features.__class__} instead."
-        )
-        assert len(features.shape) == 1, (
-            f"Instance features must be a vector. "
-            f"Found array with shape {features.shape} instead."
+        _assert_is_vector(
+            features,
+            None,
+            "get_instance_features",
+            "f",
+            "floating point numbers",
         )
-        assert features.dtype.kind in [
-            "f"
-        ], f"Instance features have unsupported {features.dtype}"
         sample.put_array("static_instance_features", features)
 
     @classmethod
@@ -332,19 +272,26 @@ class FeaturesExtractor:
         with_m1: bool = True,
         with_m2: bool = True,
         with_m3: bool = True,
+        with_static: bool = True,
     ) -> np.ndarray:
         """
         Computes static variable features described in:
             Alvarez, A. M., Louveaux, Q., & Wehenkel, L. (2017). A machine learning-based
             approximation of strong branching. INFORMS Journal on Computing, 29(1),
             185-195.
+
+        If `with_static` is False, only the features that depend on the LP solution
+        (37 and 44-48) are computed.
         """
-        assert b is not None
         assert c is not None
         nvars = len(c)
         curr = 0
         max_n_features = 40
-        features = np.zeros((nvars, max_n_features))
+        # Features are written one column at a time, so column-major storage keeps
+        # each write contiguous in memory. Only the first `curr` columns are ever
+        # returned, and all of them are written by push, so there is no need to
+        # zero-initialize the buffer.
+        features = np.empty((nvars, max_n_features), order="F")
 
         def push(v: np.ndarray) -> None:
             nonlocal curr
@@ -360,19 +307,26 @@ class FeaturesExtractor:
             M_min = np.ravel(M.min(axis=0).todense())
             return M_max, M_min
 
+        # sign(c_i) and |c_i| are used by several features below
+        c_sign = np.sign(c)
+        c_abs = np.abs(c)
+
         with np.errstate(divide="ignore", invalid="ignore"):
-            # Feature 1
-            push(np.sign(c))
+            if with_static:
+                # Feature 1
+                push(c_sign)
+
+                # Feature 2
+                c_pos_sum = c[c > 0].sum()
+                push(c_abs / c_pos_sum)
 
-            # Feature 2
-            c_pos_sum = c[c > 0].sum()
-            push(np.abs(c) / c_pos_sum)
+                # Feature 3
+                c_neg_sum = -c[c < 0].sum()
+                push(c_abs / c_neg_sum)
 
-            # Feature 3
-            c_neg_sum = -c[c < 0].sum()
-            push(np.abs(c) / c_neg_sum)
+            if with_static and A is not None and with_m1:
+                assert b is not None
 
-            if A is not None and with_m1:
                 # Compute A_ji / |b_j|
                 M1 = A.T.multiply(1.0 / np.abs(b)).T.tocsr()
 
@@ -400,9 +354,9 @@ class FeaturesExtractor:
                 push_sign_abs(M1_neg_min)
                 push_sign_abs(M1_neg_max)
 
-            if A is not None and with_m2:
+            if with_static and A is not None and with_m2:
                 # Compute |c_i| / A_ij
-                M2 = A.power(-1).multiply(np.abs(c)).tocsc()
+                M2 = A.power(-1).multiply(c_abs).tocsc()
 
                 # Compute max/min
                 M2_max, M2_min = maxmin(M2)
@@ -423,10 +377,18 @@ class FeaturesExtractor:
                 push_sign_abs(M2_neg_min)
                 push_sign_abs(M2_neg_max)
 
-            if A is not None and with_m3:
-                # Compute row sums
-                S_pos = A.maximum(0).sum(axis=1)
-                S_neg = np.abs(A.minimum(0).sum(axis=1))
+            if with_static and A is not None and with_m3:
+                # Compute positive and negative row sums
+                S_pos = np.bincount(
+                    A.row,
+                    weights=np.maximum(A.data, 0),
+                    minlength=A.shape[0],
+                ).reshape(-1, 1)
+                S_neg = np.bincount(
+                    A.row,
+                    weights=-np.minimum(A.data, 0),
+                    minlength=A.shape[0],
+                ).reshape(-1, 1)
 
                 # Divide A by positive and negative row sums
                 M3_pos = A.multiply(1 / S_pos).tocsr()
@@ -464,12 +426,8 @@ class FeaturesExtractor:
 
             # Feature 37
             if values is not None:
-                push(
-                    np.minimum(
-                        values - np.floor(values),
-                        np.ceil(values) - values,
-                    )
-                )
+                frac = values - np.floor(values)
+                push(np.minimum(frac, 1.0 - frac))
 
             # Features 38-43: only available during B&B
 
@@ -484,8 +442,8 @@ class FeaturesExtractor:
                 # Feature 45 is duplicated
 
                 # Feature 47-48
-                push(np.log(c - c_sa_down / np.sign(c)))
-                push(np.log(c - c_sa_up / np.sign(c)))
+                push(np.log(c - c_sa_down / c_sign))
+                push(np.log(c - c_sa_up / c_sign))
 
                 # Features 49-64: only available during B&B
 
@@ -497,8 +455,58 @@ class FeaturesExtractor:
 def _fix_infinity(m: Optional[np.ndarray]) -> None:
     if m is None:
         return
-    masked = np.ma.masked_invalid(m)
-    max_values = np.max(masked, axis=0)
-    min_values = np.min(masked, axis=0)
-    m[:] = np.maximum(np.minimum(m, max_values), min_values)
+    finite = np.isfinite(m)
+    if finite.all():
+        return
+    max_values = np.where(finite, m, -np.inf).max(axis=0)
+    min_values = np.where(finite, m, np.inf).min(axis=0)
+
+    # Columns without any finite values are clipped to 1e20
+    no_finite = ~finite.any(axis=0)
+    max_values[no_finite] = 1e20
+    min_values[no_finite] = 1e20
+
+    np.minimum(m, max_values, out=m)
+    np.maximum(m, min_values, out=m)
     m[~np.isfinite(m)] = 0.0
+
+
+def _assert_is_matrix(value: Any, n_rows: int, method: str) -> None:
+    assert isinstance(
+        value, np.ndarray
+    ), f"{method} must return a numpy array. Found {value.__class__} instead."
+    assert len(value.shape) == 2, (
+        f"{method} must return a 2-dimensional array. "
+        f"Found array with shape {value.shape} instead."
+    )
+    assert value.shape[0] == n_rows, (
+        f"{method} must return an array with {n_rows} rows. "
+        f"Found {value.shape[0]} rows instead."
+    )
+    assert (
+        value.dtype.kind == "f"
+    ), f"{method} must return floating point numbers. Found {value.dtype} instead."
+
+
+def _assert_is_vector(
+    value: Any,
+    n_elements: Optional[int],
+    method: str,
+    kind: str,
+    kind_description: str,
+) -> None:
+    assert isinstance(
+        value, np.ndarray
+    ), f"{method} must return a numpy array. Found {value.__class__} instead."
+    assert len(value.shape) == 1, (
+        f"{method} must return a vector. "
+        f"Found array with shape {value.shape} instead."
+    )
+    if n_elements is not None:
+        assert len(value) == n_elements, (
+            f"{method} must return a vector with {n_elements} elements. "
+            f"Found {value.shape[0]} elements instead."
+        )
+    assert (
+        value.dtype.kind == kind
+    ), f"{method} must return {kind_description}. Found {value.dtype} instead."
@@ -3,7 +3,6 @@
 #  Released under the modified BSD license. See COPYING.md for more details.
 import warnings
 from abc import ABC, abstractmethod
-from copy import deepcopy
 from typing import Dict, Optional, Any, Union, List, Tuple, cast, Set
 from scipy.sparse import coo_matrix
 
@@ -12,6 +11,24 @@ import numpy as np
 from h5py import Dataset
 from overrides import overrides
 
+# Arrays larger than this are stored chunked and compressed, in chunks of roughly this
+# size. Smaller arrays are stored contiguously, since the filter pipeline would cost
+# more than it saves.
+_CHUNK_BYTES = 1 << 20
+
+# Scalars are stored as attributes of the root group, which are kept in the object
+# header and can be read without opening a dataset. Strings longer than this are
+# stored as datasets instead, to stay clear of the HDF5 attribute size limit.
+_MAX_ATTR_LEN = 16 * 1024
+
+# Version of the layout written by Hdf5Sample, stored as a root attribute of every
+# file opened for writing. Version 2 stores scalars as root attributes and sparse
+# matrices as single compound datasets. Files without this attribute were written
+# by older versions and use one dataset per scalar and per sparse component; they
+# can still be read.
+_FORMAT_VERSION = 2
+_FORMAT_VERSION_KEY = "miplearn_format_version"
+
 Bytes = Union[bytes, bytearray]
 Scalar = Union[None, bool, str, int, float]
 Vector = Union[
@@ -38,6 +55,8 @@ VectorList = Union[
 class Sample(ABC):
     """Abstract dictionary-like class that stores training data."""
 
+    __slots__ = ()
+
     @abstractmethod
     def get_scalar(self, key: str) -> Optional[Any]:
         pass
@@ -83,15 +102,34 @@ class Sample(ABC):
 
 
 class MemorySample(Sample):
-    """Dictionary-like class that stores training data in-memory."""
+    """
+    Dictionary-like class that stores training data in-memory.
+
+    If `check_data=False`, the type checks performed on every put are skipped.
+    """
+
+    __slots__ = ("_data", "_check_data")
 
     def __init__(
         self,
         data: Optional[Dict[str, Any]] = None,
+        check_data: bool = True,
     ) -> None:
         if data is None:
             data = {}
         self._data: Dict[str, Any] = data
+        self._check_data = check_data
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        # Samples pickled before __slots__ was declared store their __dict__, which
+        # has the same keys, so both are restored the same way. Older samples have
+        # no `_check_data`, and are restored with the constructor default.
+        self._check_data = True
+        for (name, value) in state.items():
+            setattr(self, name, value)
 
     @overrides
     def get_scalar(self, key: str) -> Optional[Any]:
@@ -101,14 +139,12 @@ class MemorySample(Sample):
     def put_scalar(self, key: str, value: Scalar) -> None:
         if value is None:
             return
-        self._assert_is_scalar(value)
+        if self._check_data:
+            self._assert_is_scalar(value)
         self._put(key, value)
 
     def _get(self, key: str) -> Optional[Any]:
-        if key in self._data:
-            return self._data[key]
-        else:
-            return None
+        return self._data.get(key)
 
     def _put(self, key: str, value: Any) -> None:
         self._data[key] = value
@@ -117,7 +153,8 @@ class MemorySample(Sample):
     def put_array(self, key: str, value: Optional[np.ndarray]) -> None:
         if value is None:
             return
-        self._assert_is_array(value)
+        if self._check_data:
+            self._assert_is_array(value)
         self._put(key, value)
 
     @overrides
@@ -128,7 +165,8 @@ class MemorySample(Sample):
     def put_sparse(self, key: str, value: coo_matrix) -> None:
         if value is None:
             return
-        self._assert_is_sparse(value)
+        if self._check_data:
+            self._assert_is_sparse(value)
         self._put(key, value)
 
     @overrides
@@ -142,20 +180,59 @@ class Hdf5Sample(Sample):
 
     Unlike MemorySample, this class only loads to memory the parts of the data set that
     are actually accessed, and therefore it is more scalable.
+
+    The arguments `rdcc_nbytes`, `rdcc_nslots` and `rdcc_w0` configure the HDF5 raw
+    data chunk cache and are forwarded to `h5py.File`; by default, h5py's defaults
+    are used. Note that the cache is allocated per open dataset, not per file, so
+    large values of `rdcc_nbytes` multiply quickly when many datasets are read.
+
+    If `check_data=False`, the type checks performed on every put are skipped.
     """
 
+    __slots__ = ("file", "_cache", "_check_data")
+
     def __init__(
         self,
         filename: str,
         mode: str = "r+",
+        rdcc_nbytes: Optional[int] = None,
+        rdcc_nslots: Optional[int] = None,
+        rdcc_w0: Optional[float] = None,
+        check_data: bool = True,
     ) -> None:
-        self.file = h5py.File(filename, mode, libver="latest")
+        self.file = h5py.File(
+            filename,
+            mode,
+            libver="latest",
+            rdcc_nbytes=rdcc_nbytes,
+            rdcc_nslots=rdcc_nslots,
+            rdcc_w0=rdcc_w0,
+        )
+        version = self.file.attrs.get(_FORMAT_VERSION_KEY)
+        if version is not None:
+            assert (
+                version <= _FORMAT_VERSION
+            ), f"Unsupported file format version: {version}"
+        elif mode != "r":
+            self.file.attrs[_FORMAT_VERSION_KEY] = _FORMAT_VERSION
+        self._cache: Dict[str, Dataset] = {}
+        self._check_data = check_data
 
     @overrides
     def get_scalar(self, key: str) -> Optional[Any]:
-        if key not in self.file:
+        value = self.file.attrs.get(key)
+        if value is not None:
+            if isinstance(value, bytes):
+                return value.decode()
+            if isinstance(value, np.generic):
+                return value.tolist()
+            return value
+
+        # Long strings, and files written by older versions, store scalars as
+        # zero-dimensional datasets
+        ds = self._get_dataset(key)
+        if ds is None:
             return None
-        ds = self.file[key]
         assert (
             len(ds.shape) == 0
         ), f"0-dimensional array expected; found shape {ds.shape}"
@@ -168,39 +245,123 @@ class Hdf5Sample(Sample):
     def put_scalar(self, key: str, value: Any) -> None:
         if value is None:
             return
-        self._assert_is_scalar(value)
-        if key in self.file:
-            del self.file[key]
-        self.file.create_dataset(key, data=value)
+        if self._check_data:
+            self._assert_is_scalar(value)
+        self._delete(key)
+        if isinstance(value, (str, bytes)) and len(value) > _MAX_ATTR_LEN:
+            self.file.create_dataset(key, data=value)
+        else:
+            self.file.attrs[key] = value
 
     @overrides
-    def put_array(self, key: str, value: Optional[np.ndarray]) -> None:
+    def put_array(
+        self,
+        key: str,
+        value: Optional[np.ndarray],
+        quantize: Optional[str] = None,
+    ) -> None:
+        """
+        Stores an array in the file. Floating point arrays are stored as float32 by
+        default. If `quantize="f2"`, they are instead clipped to the float16 range and
+        stored as float16. If `quantize="i1"`, they are linearly mapped into int8,
+        which is only appropriate for bounded values; the original range is kept in
+        the `q_lo` and `q_hi` attributes and undone by `get_array`. Quantization is
+        specific to Hdf5Sample; it is not part of the Sample interface.
+        """
         if value is None:
             return
-        self._assert_is_array(value)
+        if self._check_data:
+            self._assert_is_array(value)
+        assert quantize in [None, "f4", "f2", "i1"], f"Unknown quantization: {quantize}"
+        attrs: Dict[str, float] = {}
         if value.dtype.kind == "f":
-            value = value.astype("float32")
-        if key in self.file:
-            del self.file[key]
-        return self.file.create_dataset(key, data=value, compression="gzip")
+            if quantize == "f2":
+                f2 = np.finfo("float16")
+                value = np.clip(value, f2.min, f2.max).astype("float16")
+            elif quantize == "i1":
+                assert np.isfinite(
+                    value
+                ).all(), "i1 quantization requires finite values"
+                lo = float(value.min()) if value.size > 0 else 0.0
+                hi = float(value.max()) if value.size > 0 else 0.0
+                scale = 255.0 / (hi - lo) if hi > lo else 0.0
+                value = np.round((value - lo) * scale - 128).astype("int8")
+                attrs = {"q_lo": lo, "q_hi": hi}
+            else:
+                value = value.astype("float32", copy=False)
+        self._delete(key)
+        ds = self._create_dataset(key, value)
+        for (k, v) in attrs.items():
+            ds.attrs[k] = v
 
     @overrides
-    def get_array(self, key: str) -> Optional[np.ndarray]:
-        if key not in self.file:
+    def get_array(
+        self,
+        key: str,
+        out: Optional[np.ndarray] = None,
+    ) -> Optional[np.ndarray]:
+        """
+        Reads an array from the file. If `out` is provided, is C-contiguous and matches
+        the shape and dtype of the stored array, the data is read directly into it and
+        `out` is returned, avoiding a new allocation. Otherwise, a new array is
+        returned.
+        """
+        ds = self._get_dataset(key)
+        if ds is None:
             return None
-        return self.file[key][:]
+        dtype = ds.dtype
+        assert dtype.names is None, f"{key} holds a sparse matrix; use get_sparse"
+        # Only int8 datasets may be quantized; skip the attribute lookup otherwise
+        if dtype == np.int8 and "q_lo" in ds.attrs:
+            lo, hi = ds.attrs["q_lo"], ds.attrs["q_hi"]
+            q = ds[:].astype("float32")
+            return (q + 128) * np.float32((hi - lo) / 255.0) + np.float32(lo)
+        if (
+            out is not None
+            and out.shape == ds.shape
+            and out.dtype == dtype
+            and out.flags.c_contiguous
+        ):
+            ds.read_direct(out)
+            return out
+        return ds[:]
 
     @overrides
     def put_sparse(self, key: str, value: coo_matrix) -> None:
         if value is None:
             return
-        self._assert_is_sparse(value)
-        self.put_array(f"{key}_row", value.row)
-        self.put_array(f"{key}_col", value.col)
-        self.put_array(f"{key}_data", value.data)
+        if self._check_data:
+            self._assert_is_sparse(value)
+        data = value.data
+        if data.dtype.kind == "f":
+            data = data.astype("float32", copy=False)
+        entries = np.empty(
+            value.nnz,
+            dtype=[
+                ("row", value.row.dtype),
+                ("col", value.col.dtype),
+                ("data", data.dtype),
+            ],
+        )
+        entries["row"] = value.row
+        entries["col"] = value.col
+        entries["data"] = data
+        for k in [key, f"{key}_row", f"{key}_col", f"{key}_data"]:
+            self._delete(k)
+        ds = self._create_dataset(key, entries)
+        ds.attrs["shape"] = value.shape
 
     @overrides
     def get_sparse(self, key: str) -> Optional[coo_matrix]:
+        ds = self._get_dataset(key)
+        if ds is not None:
+            entries = ds[:]
+            return coo_matrix(
+                (entries["data"], (entries["row"], entries["col"])),
+                shape=tuple(ds.attrs["shape"]),
+            )
+
+        # Files written by older versions store each component separately
         row = self.get_array(f"{key}_row")
         if row is None:
             return None
@@ -210,10 +371,49 @@ class Hdf5Sample(Sample):
         assert data is not None
         return coo_matrix((data, (row, col)))
 
+    def close(self) -> None:
+        """Closes the underlying file. Any further access to this sample fails."""
+        self._cache.clear()
+        self.file.close()
+
+    def _create_dataset(self, key: str, value: np.ndarray) -> Dataset:
+        if value.nbytes <= _CHUNK_BYTES:
+            return self.file.create_dataset(key, data=value)
+        row_bytes = value.itemsize * int(np.prod(value.shape[1:]))
+        chunk_rows = max(1, min(value.shape[0], _CHUNK_BYTES // max(1, row_bytes)))
+        return self.file.create_dataset(
+            key,
+            data=value,
+            chunks=(chunk_rows,) + value.shape[1:],
+            shuffle=True,
+            compression="gzip",
+        )
+
+    def _get_dataset(self, key: str) -> Optional[Dataset]:
+        ds = self._cache.get(key)
+        if ds is None:
+            ds = self.file.get(key)
+            if ds is None:
+                # h5py reports every key as missing once the file is closed
+                assert self.file.id.valid, "Hdf5Sample has been closed"
+                return None
+            # Chunked datasets are not kept open, since each open dataset holds
+            # its own chunk cache in memory
+            if ds.chunks is None:
+                self._cache[key] = ds
+        return ds
+
+    def _delete(self, key: str) -> None:
+        self._cache.pop(key, None)
+        if key in self.file:
+            del self.file[key]
+        if key in self.file.attrs:
+            del self.file.attrs[key]
+
     def get_bytes(self, key: str) -> Optional[Bytes]:
-        if key not in self.file:
+        ds = self._get_dataset(key)
+        if ds is None:
             return None
-        ds = self.file[key]
         assert (
             len(ds.shape) == 1
         ), f"1-dimensional array expected; found shape {ds.shape}"
@@ -99,12 +99,7 @@ class MultiKnapsackInstance(Instance):
 
     @overrides
     def get_variable_features(self, names: np.ndarray) -> np.ndarray:
-        features = []
-        for i in range(len(self.weights)):
-            f = [self.prices[i]]
-            f.extend(self.weights[:, i])
-            features.append(f)
-        return np.array(features)
+        return np.column_stack([self.prices, self.weights.T])
 
 
 # noinspection PyPep8Naming
@@ -71,23 +71,21 @@ class MaxWeightStableSetInstance(Instance):
         assert len(names) == len(self.nodes)
         for i, v1 in enumerate(self.nodes):
             assert names[i] == f"x[{v1}]".encode()
-            neighbor_weights = [0.0] * 15
-            neighbor_degrees = [100.0] * 15
-            for v2 in self.graph.neighbors(v1):
-                neighbor_weights += [self.weights[v2] / self.weights[v1]]
-                neighbor_degrees += [self.graph.degree(v2) / self.graph.degree(v1)]
+            w1 = self.weights[v1]
+            d1 = self.graph.degree(v1)
+            neighbors = list(self.graph.neighbors(v1))
+            neighbor_weights = [self.weights[v2] / w1 for v2 in neighbors]
+            neighbor_degrees = [self.graph.degree(v2) / d1 for v2 in neighbors]
+            neighbor_weights.extend([0.0] * 15)
+            neighbor_degrees.extend([100.0] * 15)
             neighbor_weights.sort(reverse=True)
             neighbor_degrees.sort()
-            f = []
-            f += neighbor_weights[:5]
-            f += neighbor_degrees[:5]
-            f += [self.graph.degree(v1)]
-            features.append(f)
+            features.append(neighbor_weights[:5] + neighbor_degrees[:5] + [d1])
         return np.array(features)
 
     @overrides
     def get_variable_categories(self, names: np.ndarray) -> np.ndarray:
-        return np.array(["default" for _ in names], dtype="S")
+        return np.full(len(names), b"default")
 
 
 class MaxWeightStableSetGenerator:
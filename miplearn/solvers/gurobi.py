@@ -6,11 +6,11 @@ import re
 import sys
 from io import StringIO
 from random import randint
-from typing import List, Any, Dict, Optional, TYPE_CHECKING
+from typing import List, Any, Dict, FrozenSet, Optional, Pattern, TYPE_CHECKING
 
 import numpy as np
 from overrides import overrides
-from scipy.sparse import coo_matrix, lil_matrix
+from scipy.sparse import coo_matrix
 
 from miplearn.instance.base import Instance
 from miplearn.solvers import _RedirectOutput
@@ -35,6 +35,12 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# Maps Gurobi's VBasis and CBasis attribute values to MIPLearn basis status codes
+_GUROBI_VBASIS = {0: "B", -1: "L", -2: "U", -3: "S"}
+_GUROBI_CBASIS = {0: "B", -1: "N"}
+
+_WARM_START_RE = re.compile("MIP start with objective ([0-9.e+-]*)")
+
 
 class GurobiSolver(InternalSolver):
     """
@@ -49,12 +55,17 @@ class GurobiSolver(InternalSolver):
         If 1, calls lazy constraint callbacks whenever an integer solution
         is found. If 2, calls it also at every node, after solving the
         LP relaxation of that node.
+    capture_log: bool
+        If True, solver logs are captured in memory and returned in the solve
+        statistics. If False, they are discarded (unless `tee=True`), and the warm
+        start value, which is parsed from the log, is not reported.
     """
 
     def __init__(
         self,
         params: Optional[SolverParams] = None,
         lazy_cb_frequency: int = 1,
+        capture_log: bool = True,
     ) -> None:
         import gurobipy
 
@@ -70,7 +81,7 @@ class GurobiSolver(InternalSolver):
         self.params: SolverParams = params
         self.cb_where: Optional[int] = None
         self.lazy_cb_frequency = lazy_cb_frequency
-        self._dirty = True
+        self.capture_log = capture_log
         self._has_lp_solution = False
         self._has_mip_solution = False
 
@@ -81,6 +92,8 @@ class GurobiSolver(InternalSolver):
         self._var_names: np.ndarray = np.empty(0)
         self._constr_names: List[str] = []
         self._var_types: np.ndarray = np.empty(0)
+        self._bin_vars: List["gurobipy.Var"] = []
+        self._int_vars: List["gurobipy.Var"] = []
         self._var_lbs: np.ndarray = np.empty(0)
         self._var_ubs: np.ndarray = np.empty(0)
         self._var_obj_coeffs: np.ndarray = np.empty(0)
@@ -101,22 +114,30 @@ class GurobiSolver(InternalSolver):
         assert cf.rhs is not None
         assert self.model is not None
         lhs = cf.lhs.tocsr()
+        indptr = lhs.indptr.tolist()
+        indices = lhs.indices.tolist()
+        data = lhs.data.tolist()
+        sense_map = {
+            b"=": self.gp.GRB.EQUAL,
+            b"<": self.gp.GRB.LESS_EQUAL,
+            b">": self.gp.GRB.GREATER_EQUAL,
+        }
         for i in range(len(cf.names)):
             sense = cf.senses[i]
-            row = lhs[i, :]
-            row_expr = self.gp.quicksum(
-                self._gp_vars[row.indices[j]] * row.data[j] for j in range(row.getnnz())
+            start, end = indptr[i], indptr[i + 1]
+            row_expr = self.gp.LinExpr(
+                data[start:end],
+                [self._gp_vars[j] for j in indices[start:end]],
             )
-            if sense == b"=":
-                self.model.addConstr(row_expr == cf.rhs[i], name=cf.names[i])
-            elif sense == b"<":
-                self.model.addConstr(row_expr <= cf.rhs[i], name=cf.names[i])
-            elif sense == b">":
-                self.model.addConstr(row_expr >= cf.rhs[i], name=cf.names[i])
-            else:
+            if sense not in sense_map:
                 raise Exception(f"Unknown sense: {sense}")
+            self.model.addLConstr(
+                row_expr,
+                sense_map[sense],
+                cf.rhs[i],
+                name=cf.names[i],
+            )
         self.model.update()
-        self._dirty = True
         self._has_lp_solution = False
         self._has_mip_solution = False
 
@@ -135,20 +156,19 @@ class GurobiSolver(InternalSolver):
         assert cf.lhs is not None
         assert cf.rhs is not None
         assert self.model is not None
-        result = []
-        x = np.array(self.model.getAttr("x", self.model.getVars()))
-        lhs = cf.lhs.tocsr() * x
-        for i in range(len(cf.names)):
-            sense = cf.senses[i]
-            if sense == b"<":
-                result.append(lhs[i] <= cf.rhs[i] + tol)
-            elif sense == b">":
-                result.append(lhs[i] >= cf.rhs[i] - tol)
-            elif sense == b"<":
-                result.append(abs(cf.rhs[i] - lhs[i]) <= tol)
-            else:
-                raise Exception(f"unknown sense: {sense}")
-        return result
+        lhs = cf.lhs.tocsr() @ self._get_values()
+        is_le = cf.senses == b"<"
+        is_ge = cf.senses == b">"
+        is_eq = cf.senses == b"="
+        is_unknown = ~(is_le | is_ge | is_eq)
+        if is_unknown.any():
+            raise Exception(f"unknown sense: {cf.senses[is_unknown][0]}")
+        result = (
+            (is_le & (lhs <= cf.rhs + tol))
+            | (is_ge & (lhs >= cf.rhs - tol))
+            | (is_eq & (np.abs(cf.rhs - lhs) <= tol))
+        )
+        return result.tolist()
 
     @overrides
     def build_test_instance_infeasible(self) -> Instance:
@@ -167,18 +187,22 @@ class GurobiSolver(InternalSolver):
         return GurobiSolver(
             params=self.params,
             lazy_cb_frequency=self.lazy_cb_frequency,
+            capture_log=self.capture_log,
         )
 
     @overrides
     def fix(self, solution: Solution) -> None:
         self._raise_if_callback()
+        assert self.model is not None
+        gp_vars, values = [], []
         for (varname, value) in solution.items():
             if value is None:
                 continue
-            var = self._varname_to_var[varname]
-            var.vtype = self.gp.GRB.CONTINUOUS
-            var.lb = value
-            var.ub = value
+            gp_vars.append(self._varname_to_var[varname])
+            values.append(value)
+        self.model.setAttr("vtype", gp_vars, [self.gp.GRB.CONTINUOUS] * len(gp_vars))
+        self.model.setAttr("lb", gp_vars, values)
+        self.model.setAttr("ub", gp_vars, values)
 
     @overrides
     def get_constraint_attrs(self) -> List[str]:
@@ -208,13 +232,6 @@ class GurobiSolver(InternalSolver):
         assert model is not None
         assert model.numVars == len(self._gp_vars)
 
-        def _parse_gurobi_cbasis(v: int) -> str:
-            if v == 0:
-                return "B"
-            if v == -1:
-                return "N"
-            raise Exception(f"unknown cbasis: {v}")
-
         gp_constrs = model.getConstrs()
         constr_names = np.array(model.getAttr("constrName", gp_constrs), dtype="S")
         lhs: Optional[coo_matrix] = None
@@ -225,20 +242,14 @@ class GurobiSolver(InternalSolver):
             rhs = np.array(model.getAttr("rhs", gp_constrs), dtype=float)
             senses = np.array(model.getAttr("sense", gp_constrs), dtype="S")
             if with_lhs:
-                nrows = len(gp_constrs)
-                ncols = len(self._var_names)
-                tmp = lil_matrix((nrows, ncols), dtype=float)
-                for (i, gp_constr) in enumerate(gp_constrs):
-                    expr = model.getRow(gp_constr)
-                    for j in range(expr.size()):
-                        tmp[i, expr.getVar(j).index] = expr.getCoeff(j)
-                lhs = tmp.tocoo()
+                lhs = model.getA().tocoo()
 
         if self._has_lp_solution:
             dual_value = np.array(model.getAttr("pi", gp_constrs), dtype=float)
-            basis_status = np.array(
-                [_parse_gurobi_cbasis(c) for c in model.getAttr("cbasis", gp_constrs)],
-                dtype="S",
+            basis_status = _parse_gurobi_basis(
+                model.getAttr("cbasis", gp_constrs),
+                _GUROBI_CBASIS,
+                "cbasis",
             )
             if with_sa:
                 sa_rhs_up = np.array(model.getAttr("saRhsUp", gp_constrs), dtype=float)
@@ -265,24 +276,17 @@ class GurobiSolver(InternalSolver):
     def get_solution(self) -> Optional[Solution]:
         assert self.model is not None
         if self.cb_where is not None:
-            if self.cb_where == self.gp.GRB.Callback.MIPNODE:
-                return {
-                    v.varName.encode(): self.model.cbGetNodeRel(v)
-                    for v in self.model.getVars()
-                }
-            elif self.cb_where == self.gp.GRB.Callback.MIPSOL:
-                return {
-                    v.varName.encode(): self.model.cbGetSolution(v)
-                    for v in self.model.getVars()
-                }
-            else:
+            if self.cb_where not in [
+                self.gp.GRB.Callback.MIPNODE,
+                self.gp.GRB.Callback.MIPSOL,
+            ]:
                 raise Exception(
                     f"get_solution can only be called from a callback "
                     f"when cb_where is either MIPNODE or MIPSOL"
                 )
-        if self.model.solCount == 0:
+        elif self.model.solCount == 0:
             return None
-        return {v.varName.encode(): v.x for v in self.model.getVars()}
+        return dict(zip(self._var_names.tolist(), self._get_values().tolist()))
 
     @overrides
     def get_variable_attrs(self) -> List[str]:
@@ -314,18 +318,6 @@ class GurobiSolver(InternalSolver):
         model = self.model
         assert model is not None
 
-        def _parse_gurobi_vbasis(b: int) -> str:
-            if b == 0:
-                return "B"
-            elif b == -1:
-                return "L"
-            elif b == -2:
-                return "U"
-            elif b == -3:
-                return "S"
-            else:
-                raise Exception(f"unknown vbasis: {basis_status}")
-
         basis_status: Optional[np.ndarray] = None
         upper_bounds, lower_bounds, types, values = None, None, None, None
         obj_coeffs, reduced_costs = None, None
@@ -340,12 +332,10 @@ class GurobiSolver(InternalSolver):
 
         if self._has_lp_solution:
             reduced_costs = np.array(model.getAttr("rc", self._gp_vars), dtype=float)
-            basis_status = np.array(
-                [
-                    _parse_gurobi_vbasis(b)
-                    for b in model.getAttr("vbasis", self._gp_vars)
-                ],
-                dtype="S",
+            basis_status = _parse_gurobi_basis(
+                model.getAttr("vbasis", self._gp_vars),
+                _GUROBI_VBASIS,
+                "vbasis",
             )
 
             if with_sa:
@@ -424,11 +414,15 @@ class GurobiSolver(InternalSolver):
     @overrides
     def set_warm_start(self, solution: Solution) -> None:
         self._raise_if_callback()
+        assert self.model is not None
         self._clear_warm_start()
+        gp_vars, values = [], []
         for (var_name, value) in solution.items():
             var = self._varname_to_var[var_name]
             if value is not None:
-                var.start = value
+                gp_vars.append(var)
+                values.append(value)
+        self.model.setAttr("start", gp_vars, values)
 
     @overrides
     def solve(
@@ -444,13 +438,25 @@ class GurobiSolver(InternalSolver):
             iteration_cb = lambda: False
         callback_exceptions = []
 
-        # Create callback wrapper
+        # Create callback wrapper. Relevant callback locations are resolved
+        # once here, so the wrapper returns immediately for all others. If there
+        # are no callbacks at all, Gurobi is not given one.
+        lazy_where: FrozenSet[int] = frozenset()
+        cut_where: FrozenSet[int] = frozenset()
+        if lazy_cb is not None:
+            lazy_where = frozenset(self.lazy_cb_where)
+        if user_cut_cb is not None:
+            cut_where = frozenset([self.gp.GRB.Callback.MIPNODE])
+        cb_where_set = lazy_where | cut_where
+
         def cb_wrapper(cb_model: Any, cb_where: int) -> None:
+            if cb_where not in cb_where_set:
+                return
             try:
                 self.cb_where = cb_where
-                if lazy_cb is not None and cb_where in self.lazy_cb_where:
+                if cb_where in lazy_where and lazy_cb is not None:
                     lazy_cb(self, self.model)
-                if user_cut_cb is not None and cb_where == self.gp.GRB.Callback.MIPNODE:
+                if cb_where in cut_where and user_cut_cb is not None:
                     user_cut_cb(self, self.model)
             except Exception as e:
                 logger.exception("callback error")
@@ -467,14 +473,16 @@ class GurobiSolver(InternalSolver):
         # Solve problem
         total_wallclock_time = 0
         total_nodes = 0
-        streams: List[Any] = [StringIO()]
+        streams: List[Any] = [StringIO()] if self.capture_log else []
         if tee:
             streams += [sys.stdout]
         self._apply_params(streams)
         while True:
             with _RedirectOutput(streams):
-                self.model.optimize(cb_wrapper)
-                self._dirty = False
+                if len(cb_where_set) > 0:
+                    self.model.optimize(cb_wrapper)
+                else:
+                    self.model.optimize()
             if len(callback_exceptions) > 0:
                 raise callback_exceptions[0]
             total_wallclock_time += self.model.runtime
@@ -486,7 +494,7 @@ class GurobiSolver(InternalSolver):
         self._has_mip_solution = self.model.solCount > 0
 
         # Fetch results and stats
-        log = streams[0].getvalue()
+        log = streams[0].getvalue() if self.capture_log else None
         ub, lb = None, None
         sense = "min" if self.model.modelSense == 1 else "max"
         if self.model.solCount > 0:
@@ -496,7 +504,9 @@ class GurobiSolver(InternalSolver):
             else:
                 lb = self.model.objVal
                 ub = self.model.objBound
-        ws_value = self._extract_warm_start_value(log)
+        ws_value = None
+        if log is not None:
+            ws_value = self._extract_warm_start_value(log)
         return MIPSolveStats(
             mip_lower_bound=lb,
             mip_upper_bound=ub,
@@ -513,27 +523,21 @@ class GurobiSolver(InternalSolver):
         tee: bool = False,
     ) -> LPSolveStats:
         self._raise_if_callback()
-        streams: List[Any] = [StringIO()]
+        streams: List[Any] = [StringIO()] if self.capture_log else []
         if tee:
             streams += [sys.stdout]
         self._apply_params(streams)
         assert self.model is not None
-        for (i, var) in enumerate(self._gp_vars):
-            if self._var_types[i] == b"B":
-                var.vtype = self.gp.GRB.CONTINUOUS
-                var.lb = 0.0
-                var.ub = 1.0
-            elif self._var_types[i] == b"I":
-                var.vtype = self.gp.GRB.CONTINUOUS
+        n_bin, n_int = len(self._bin_vars), len(self._int_vars)
+        self.model.setAttr("vtype", self._bin_vars, [self.gp.GRB.CONTINUOUS] * n_bin)
+        self.model.setAttr("lb", self._bin_vars, [0.0] * n_bin)
+        self.model.setAttr("ub", self._bin_vars, [1.0] * n_bin)
+        self.model.setAttr("vtype", self._int_vars, [self.gp.GRB.CONTINUOUS] * n_int)
         with _RedirectOutput(streams):
             self.model.optimize()
-            self._dirty = False
-        for (i, var) in enumerate(self._gp_vars):
-            if self._var_types[i] == b"B":
-                var.vtype = self.gp.GRB.BINARY
-            elif self._var_types[i] == b"I":
-                var.vtype = self.gp.GRB.INTEGER
-        log = streams[0].getvalue()
+        self.model.setAttr("vtype", self._bin_vars, [self.gp.GRB.BINARY] * n_bin)
+        self.model.setAttr("vtype", self._int_vars, [self.gp.GRB.INTEGER] * n_int)
+        log = streams[0].getvalue() if self.capture_log else None
         self._has_lp_solution = self.model.solCount > 0
         self._has_mip_solution = False
         opt_value = None
@@ -552,41 +556,45 @@ class GurobiSolver(InternalSolver):
                 self.model.setParam(name, value)
 
     def _clear_warm_start(self) -> None:
-        for var in self._varname_to_var.values():
-            var.start = self.gp.GRB.UNDEFINED
+        assert self.model is not None
+        self.model.setAttr(
+            "start",
+            self._gp_vars,
+            [self.gp.GRB.UNDEFINED] * len(self._gp_vars),
+        )
 
     @staticmethod
     def _extract(
         log: str,
-        regexp: str,
+        regexp: Pattern,
         default: Optional[str] = None,
     ) -> Optional[str]:
-        value = default
-        for line in log.splitlines():
-            matches = re.findall(regexp, line)
-            if len(matches) == 0:
-                continue
-            value = matches[0]
-        return value
+        match = None
+        for match in regexp.finditer(log):
+            pass
+        if match is None:
+            return default
+        return match.group(1)
 
     def _extract_warm_start_value(self, log: str) -> Optional[float]:
-        ws = self._extract(log, "MIP start with objective ([0-9.e+-]*)")
+        ws = self._extract(log, _WARM_START_RE)
         if ws is None:
             return None
         return float(ws)
 
-    def _get_value(self, var: Any) -> float:
+    def _get_values(self) -> np.ndarray:
         assert self.model is not None
         if self.cb_where == self.gp.GRB.Callback.MIPSOL:
-            return self.model.cbGetSolution(var)
+            values = self.model.cbGetSolution(self._gp_vars)
         elif self.cb_where == self.gp.GRB.Callback.MIPNODE:
-            return self.model.cbGetNodeRel(var)
+            values = self.model.cbGetNodeRel(self._gp_vars)
         elif self.cb_where is None:
-            return var.x
+            values = self.model.getAttr("x", self._gp_vars)
         else:
             raise Exception(
-                "get_value cannot be called from cb_where=%s" % self.cb_where
+                "get_values cannot be called from cb_where=%s" % self.cb_where
             )
+        return np.array(values, dtype=float)
 
     def _raise_if_callback(self) -> None:
         if self.cb_where is not None:
@@ -617,24 +625,29 @@ class GurobiSolver(InternalSolver):
             dtype=float,
         )
         constr_names: List[str] = self.model.getAttr("constrName", gp_constrs)
-        varname_to_var: Dict[bytes, "gurobipy.Var"] = {}
-        cname_to_constr: Dict = {}
-        for (i, gp_var) in enumerate(gp_vars):
-            assert var_names[i] not in varname_to_var, (
-                f"Duplicated variable name detected: {var_names[i]}. "
+        varname_to_var: Dict[bytes, "gurobipy.Var"] = dict(
+            zip(var_names.tolist(), gp_vars)
+        )
+        if len(varname_to_var) < len(gp_vars):
+            names, counts = np.unique(var_names, return_counts=True)
+            assert False, (
+                f"Duplicated variable name detected: {names[counts > 1][0]}. "
                 f"Unique variable names are currently required."
             )
-            assert var_types[i] in [b"B", b"C", b"I"], (
+        unsupported = ~np.isin(var_types, [b"B", b"C", b"I"])
+        if unsupported.any():
+            i = np.flatnonzero(unsupported)[0]
+            assert False, (
                 "Only binary and continuous variables are currently supported. "
                 f"Variable {var_names[i]} has type {var_types[i]}."
             )
-            varname_to_var[var_names[i]] = gp_var
-        for (i, gp_constr) in enumerate(gp_constrs):
-            assert constr_names[i] not in cname_to_constr, (
-                f"Duplicated constraint name detected: {constr_names[i]}. "
+        cname_to_constr: Dict = dict(zip(constr_names, gp_constrs))
+        if len(cname_to_constr) < len(gp_constrs):
+            names, counts = np.unique(constr_names, return_counts=True)
+            assert False, (
+                f"Duplicated constraint name detected: {names[counts > 1][0]}. "
                 f"Unique constraint names are currently required."
             )
-            cname_to_constr[constr_names[i]] = gp_constr
         self._varname_to_var = varname_to_var
         self._cname_to_constr = cname_to_constr
         self._gp_vars = gp_vars
@@ -642,6 +655,8 @@ class GurobiSolver(InternalSolver):
         self._var_names = var_names
         self._constr_names = constr_names
         self._var_types = var_types
+        self._bin_vars = [gp_vars[i] for i in np.flatnonzero(var_types == b"B")]
+        self._int_vars = [gp_vars[i] for i in np.flatnonzero(var_types == b"I")]
         self._var_lbs = var_lbs
         self._var_ubs = var_ubs
         self._var_obj_coeffs = var_obj_coeffs
@@ -650,16 +665,37 @@ class GurobiSolver(InternalSolver):
         return {
             "params": self.params,
             "lazy_cb_where": self.lazy_cb_where,
+            "capture_log": self.capture_log,
         }
 
     def __setstate__(self, state: Dict) -> None:
         self.params = state["params"]
         self.lazy_cb_where = state["lazy_cb_where"]
+        self.capture_log = state.get("capture_log", True)
         self.instance = None
         self.model = None
         self.cb_where = None
 
 
+def _parse_gurobi_basis(
+    values: List[int],
+    codes: Dict[int, str],
+    attr: str,
+) -> np.ndarray:
+    # Decode through a lookup table indexed by (code - offset); unused slots are empty
+    offset = min(codes)
+    table = np.zeros(max(codes) - offset + 1, dtype="S1")
+    for (code, status) in codes.items():
+        table[code - offset] = status
+    idx = np.array(values, dtype=int) - offset
+    in_range = (idx >= 0) & (idx < len(table))
+    result = table[np.where(in_range, idx, 0)]
+    unknown = ~in_range | (result == b"")
+    if unknown.any():
+        raise Exception(f"unknown {attr}: {values[np.flatnonzero(unknown)[0]]}")
+    return result
+
+
 class GurobiTestInstanceInfeasible(Instance):
     @overrides
     def to_model(self) -> Any:
@@ -696,13 +732,11 @@ class GurobiTestInstanceKnapsack(PyomoTestInstanceKnapsack):
         n = len(self.weights)
         x = model.addVars(n, vtype=GRB.BINARY, name="x")
         z = model.addVar(vtype=GRB.CONTINUOUS, name="z", ub=self.capacity)
-        model.addConstr(
-            gp.quicksum(x[i] * self.weights[i] for i in range(n)) == z,
-            "eq_capacity",
-        )
-        model.setObjective(
-            gp.quicksum(x[i] * self.prices[i] for i in range(n)), GRB.MAXIMIZE
-        )
+        xs = [x[i] for i in range(n)]
+        lhs = gp.LinExpr(list(self.weights), xs)
+        lhs.addTerms(-1.0, z)
+        model.addLConstr(lhs, GRB.EQUAL, 0.0, "eq_capacity")
+        model.setObjective(gp.LinExpr(list(self.prices), xs), GRB.MAXIMIZE)
         return model
 
     @overrides
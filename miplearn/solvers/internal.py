@@ -33,8 +33,9 @@ class LPSolveStats:
     def to_list(self) -> List[float]:
         features: List[float] = []
         for attr in ["lp_value", "lp_wallclock_time"]:
-            if getattr(self, attr) is not None:
-                features.append(getattr(self, attr))
+            value = getattr(self, attr)
+            if value is not None:
+                features.append(value)
         return features
 
 
@@ -96,23 +97,20 @@ class Constraints:
         )
 
     def __getitem__(self, selected: List[bool]) -> "Constraints":
+        mask = np.asarray(selected, dtype=bool)
         return Constraints(
             basis_status=(
-                None if self.basis_status is None else self.basis_status[selected]
+                None if self.basis_status is None else self.basis_status[mask]
             ),
-            dual_values=(
-                None if self.dual_values is None else self.dual_values[selected]
-            ),
-            names=(None if self.names is None else self.names[selected]),
-            lazy=(None if self.lazy is None else self.lazy[selected]),
-            lhs=(None if self.lhs is None else self.lhs.tocsr()[selected].tocoo()),
-            rhs=(None if self.rhs is None else self.rhs[selected]),
-            sa_rhs_down=(
-                None if self.sa_rhs_down is None else self.sa_rhs_down[selected]
-            ),
-            sa_rhs_up=(None if self.sa_rhs_up is None else self.sa_rhs_up[selected]),
-            senses=(None if self.senses is None else self.senses[selected]),
-            slacks=(None if self.slacks is None else self.slacks[selected]),
+            dual_values=(None if self.dual_values is None else self.dual_values[mask]),
+            names=(None if self.names is None else self.names[mask]),
+            lazy=(None if self.lazy is None else self.lazy[mask]),
+            lhs=(None if self.lhs is None else self.lhs.tocsr()[mask].tocoo()),
+            rhs=(None if self.rhs is None else self.rhs[mask]),
+            sa_rhs_down=(None if self.sa_rhs_down is None else self.sa_rhs_down[mask]),
+            sa_rhs_up=(None if self.sa_rhs_up is None else self.sa_rhs_up[mask]),
+            senses=(None if self.senses is None else self.senses[mask]),
+            slacks=(None if self.slacks is None else self.slacks[mask]),
         )
 
 
@@ -161,6 +161,24 @@ def run_basic_usage_tests(solver: InternalSolver) -> None:
     )
     assert_equals(solver.are_constraints_satisfied(cf), [False])
 
+    # Verify equality constraints
+    assert_equals(
+        solver.are_constraints_satisfied(
+            Constraints(
+                names=np.array(["eq_x1", "eq_x0"], dtype="S"),
+                lhs=coo_matrix(
+                    [
+                        [0.0, 1.0, 0.0, 0.0, 0.0],
+                        [1.0, 0.0, 0.0, 0.0, 0.0],
+                    ]
+                ),
+                rhs=np.array([0.0, 0.0]),
+                senses=np.array(["=", "="], dtype="S"),
+            )
+        ),
+        [True, False],
+    )
+
     # Add constraint and verify it affects solution
     solver.add_constraints(cf)
     assert_equals(
@@ -242,10 +260,21 @@ def run_lazy_cb_tests(solver: InternalSolver) -> None:
     instance = solver.build_test_instance_knapsack()
     model = instance.to_model()
 
+    cf = Constraints(
+        names=np.array(["cut"], dtype="S"),
+        lhs=coo_matrix([[1.0, 0.0, 0.0, 0.0, 0.0]]),
+        rhs=np.array([0.0]),
+        senses=np.array(["<"], dtype="S"),
+    )
+
     def lazy_cb(cb_solver: InternalSolver, cb_model: Any) -> None:
         relsol = cb_solver.get_solution()
         assert relsol is not None
         assert relsol[b"x[0]"] is not None
+        assert_equals(
+            cb_solver.are_constraints_satisfied(cf),
+            [relsol[b"x[0]"] <= 1e-5],
+        )
         if relsol[b"x[0]"] > 0:
             instance.enforce_lazy_constraint(cb_solver, cb_model, b"cut")
 
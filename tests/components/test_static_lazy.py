@@ -26,16 +26,13 @@ from miplearn.solvers.tests import assert_equals
 def sample() -> Sample:
     sample = MemorySample(
         {
-            "static_constr_categories": [
-                b"type-a",
-                b"type-a",
-                b"type-a",
-                b"type-b",
-                b"type-b",
-            ],
+            "static_constr_categories": np.array(
+                ["type-a", "type-a", "type-a", "type-b", "type-b"],
+                dtype="S",
+            ),
             "static_constr_lazy": np.array([True, True, True, True, False]),
             "static_constr_names": np.array(["c1", "c2", "c3", "c4", "c5"], dtype="S"),
-            "static_instance_features": [5.0],
+            "static_instance_features": np.array([5.0]),
             "mip_constr_lazy_enforced": np.array(["c1", "c2", "c4"], dtype="S"),
             "lp_constr_features": np.array(
                 [
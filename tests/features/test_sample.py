@@ -1,10 +1,12 @@
 #  MIPLearn: Extensible Framework for Learning-Enhanced Mixed-Integer Optimization
 #  Copyright (C) 2020-2021, UChicago Argonne, LLC. All rights reserved.
 #  Released under the modified BSD license. See COPYING.md for more details.
+import pickle
 from tempfile import NamedTemporaryFile
 from typing import Any
 
 import numpy as np
+import pytest
 from scipy.sparse import coo_matrix
 
 from miplearn.features.sample import MemorySample, Sample, Hdf5Sample
@@ -14,6 +16,25 @@ def test_memory_sample() -> None:
     _test_sample(MemorySample())
 
 
+def test_memory_sample_pickle() -> None:
+    sample = MemorySample({"key": 1})
+    sample.put_array("arr", np.array([1.0, 2.0]))
+    recovered = pickle.loads(pickle.dumps(sample))
+    assert recovered.get_scalar("key") == 1
+    assert (recovered.get_array("arr") == [1.0, 2.0]).all()
+
+    # Pickled by versions in which MemorySample had no __slots__
+    legacy = (
+        b"\x80\x04\x95G\x00\x00\x00\x00\x00\x00\x00\x8c\x18miplearn.features.sample"
+        b"\x94\x8c\x0cMemorySample\x94\x93\x94)\x81\x94}\x94\x8c\x05_data\x94}\x94"
+        b"\x8c\x03key\x94K\x01ssb."
+    )
+    recovered = pickle.loads(legacy)
+    assert recovered.get_scalar("key") == 1
+    recovered.put_scalar("key", 2)
+    assert recovered.get_scalar("key") == 2
+
+
 def test_hdf5_sample() -> None:
     file = NamedTemporaryFile()
     _test_sample(Hdf5Sample(file.name))
@@ -69,3 +90,127 @@ def _assert_roundtrip_sparse(sample: Sample, original: coo_matrix) -> None:
     assert recovered is not None
     assert isinstance(recovered, coo_matrix)
     assert (original != recovered).sum() == 0
+
+
+def test_hdf5_sample_get_array_sparse() -> None:
+    file = NamedTemporaryFile()
+    sample = Hdf5Sample(file.name)
+    sample.put_sparse("key", coo_matrix([[1.0, 0.0], [0.0, 2.0]]))
+    with pytest.raises(AssertionError):
+        sample.get_array("key")
+
+
+def test_hdf5_sample_legacy_sparse() -> None:
+    file = NamedTemporaryFile()
+    sample = Hdf5Sample(file.name)
+    sample.put_array("key_row", np.array([0, 1, 1]))
+    sample.put_array("key_col", np.array([0, 1, 2]))
+    sample.put_array("key_data", np.array([1.0, 2.0, 3.0]))
+    recovered = sample.get_sparse("key")
+    assert recovered is not None
+    assert (recovered.toarray() == [[1.0, 0.0, 0.0], [0.0, 2.0, 3.0]]).all()
+
+
+def test_hdf5_sample_quantize() -> None:
+    file = NamedTemporaryFile()
+    sample = Hdf5Sample(file.name)
+    original = np.array([-1.0, 0.0, 0.5, 1e6])
+    sample.put_array("key", original, quantize="f2")
+    recovered = sample.get_array("key")
+    assert recovered is not None
+    assert recovered.dtype == np.float16
+    assert np.isfinite(recovered).all()
+    original = np.array([-1.0, 0.0, 0.5, 1.0])
+    sample.put_array("key", original, quantize="i1")
+    recovered = sample.get_array("key")
+    assert recovered is not None
+    assert np.allclose(recovered, original, atol=1e-2)
+
+
+def test_hdf5_sample_close() -> None:
+    file = NamedTemporaryFile()
+    sample = Hdf5Sample(file.name, mode="w")
+    sample.put_array("key", np.array([1, 2, 3]))
+    sample.close()
+    a = Hdf5Sample(file.name, mode="r")
+    b = Hdf5Sample(file.name, mode="r")
+    a.close()
+    recovered = b.get_array("key")
+    assert recovered is not None
+    assert (recovered == [1, 2, 3]).all()
+    with pytest.raises(AssertionError):
+        a.get_array("key")
+    b.close()
+
+
+def test_hdf5_sample_get_array_out() -> None:
+    file = NamedTemporaryFile()
+    sample = Hdf5Sample(file.name)
+    sample.put_array("key", np.array([1.0, 2.0, 3.0]))
+    out = np.zeros(3, dtype=np.float32)
+    recovered = sample.get_array("key", out=out)
+    assert recovered is out
+    assert (out == [1.0, 2.0, 3.0]).all()
+    recovered = sample.get_array("key", out=np.zeros(2, dtype=np.float32))
+    assert recovered is not None
+    assert recovered.shape == (3,)
+
+
+def test_hdf5_sample_legacy_scalar() -> None:
+    file = NamedTemporaryFile()
+    sample = Hdf5Sample(file.name)
+    sample.file.create_dataset("key", data=1.0)
+    assert sample.get_scalar("key") == 1.0
+    sample.put_scalar("key", 2.0)
+    assert "key" not in sample.file
+    assert sample.get_scalar("key") == 2.0
+
+
+def test_hdf5_sample_format_version() -> None:
+    file = NamedTemporaryFile()
+    sample = Hdf5Sample(file.name)
+    assert sample.file.attrs["miplearn_format_version"] == 2
+    sample.file.attrs["miplearn_format_version"] = 3
+    sample.close()
+    with pytest.raises(AssertionError):
+        Hdf5Sample(file.name, mode="r")
+
+
+def test_hdf5_sample_chunked() -> None:
+    file = NamedTemporaryFile()
+    sample = Hdf5Sample(file.name)
+    np.random.seed(42)
+
+    # Small arrays are stored contiguously
+    sample.put_array("small", np.arange(10))
+    assert sample.file["small"].chunks is None
+
+    # Large arrays are split into chunks of whole rows of about 1 MiB
+    original = np.random.rand(300_000)
+    sample.put_array("vector", original)
+    assert sample.file["vector"].chunks == (262_144,)
+    recovered = sample.get_array("vector")
+    assert recovered is not None
+    assert (recovered == original.astype("float32")).all()
+
+    original = np.random.rand(100_000, 4)
+    sample.put_array("matrix", original)
+    assert sample.file["matrix"].chunks == (65_536, 4)
+    recovered = sample.get_array("matrix")
+    assert recovered is not None
+    assert (recovered == original.astype("float32")).all()
+
+    n = 200_000
+    original_sparse = coo_matrix(
+        (np.random.rand(n), (np.arange(n), np.arange(n) % 10)),
+        shape=(n, 10),
+    )
+    sample.put_sparse("sparse", original_sparse)
+    ds = sample.file["sparse"]
+    assert ds.chunks == ((1 << 20) // ds.dtype.itemsize,)
+    recovered_sparse = sample.get_sparse("sparse")
+    assert recovered_sparse is not None
+    assert recovered_sparse.shape == (n, 10)
+    assert (recovered_sparse.row == original_sparse.row).all()
+    assert (recovered_sparse.col == original_sparse.col).all()
+    assert (recovered_sparse.data == original_sparse.data.astype("float32")).all()
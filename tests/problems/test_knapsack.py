@@ -32,3 +32,15 @@ def test_knapsack() -> None:
     ).generate(1)[0]
     solver = LearningSolver()
     solver.solve(instance)
+
+
+def test_knapsack_variable_features() -> None:
+    instance = MultiKnapsackGenerator(
+        n=randint(low=6, high=7),
+        m=randint(low=3, high=4),
+    ).generate(1)[0]
+    names = np.array([f"x[{i}]" for i in range(6)], dtype="S")
+    features = instance.get_variable_features(names)
+    assert features.shape == (6, 4)
+    assert (features[:, 0] == instance.prices).all()
+    assert (features[:, 1:] == instance.weights.T).all()
@@ -3,6 +3,7 @@
 #  Released under the modified BSD license. See COPYING.md for more details.
 
 import logging
+import pickle
 from typing import List
 
 import pytest
@@ -11,7 +12,7 @@ from miplearn.solvers.gurobi import GurobiSolver
 from miplearn.solvers.internal import InternalSolver
 from miplearn.solvers.pyomo.gurobi import GurobiPyomoSolver
 from miplearn.solvers.pyomo.xpress import XpressPyomoSolver
-from miplearn.solvers.tests import run_internal_solver_tests
+from miplearn.solvers.tests import run_internal_solver_tests, assert_equals
 
 logger = logging.getLogger(__name__)
 
@@ -35,3 +36,25 @@ def test_gurobi_pyomo_solver() -> None:
 
 def test_gurobi_solver() -> None:
     run_internal_solver_tests(GurobiSolver())
+
+
+def test_gurobi_solver_capture_log() -> None:
+    solver = GurobiSolver(capture_log=False).clone()
+    assert not solver.capture_log
+    assert not pickle.loads(pickle.dumps(solver)).capture_log
+
+    # Solvers pickled before capture_log existed fall back to the default
+    state = solver.__getstate__()
+    del state["capture_log"]
+    legacy = GurobiSolver.__new__(GurobiSolver)
+    legacy.__setstate__(state)
+    assert legacy.capture_log
+    instance = solver.build_test_instance_knapsack()
+    solver.set_instance(instance)
+    lp_stats = solver.solve_lp()
+    assert lp_stats.lp_log is None
+    solver.set_warm_start({b"x[0]": 1.0, b"x[1]": 0.0, b"x[2]": 0.0, b"x[3]": 1.0})
+    mip_stats = solver.solve()
+    assert mip_stats.mip_log is None
+    assert mip_stats.mip_warm_start_value is None
+    assert_equals(mip_stats.mip_lower_bound, 1183.0)